@@ -5,6 +5,7 @@ A Flask-based web application for managing USB drives through a web interface.
 """
 
 import os
+import atexit
 import json
 import shutil
 import subprocess
@@ -12,6 +13,8 @@ import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+from zlib import adler32
 
 from flask import Flask, render_template, request, jsonify, send_file, abort
 from flask_wtf.csrf import CSRFProtect
@@ -20,6 +23,7 @@ from werkzeug.exceptions import RequestEntityTooLarge
 
 from utils.usb_manager import USBManager
 from utils.file_operations import FileOperations
+from utils.json_provider import OrjsonProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +31,7 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
@@ -40,14 +45,25 @@ app.config['WTF_CSRF_ENABLED'] = False
 # Initialize managers
 usb_manager = USBManager()
 file_ops = FileOperations(usb_manager)
+atexit.register(usb_manager.close)
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# The dashboard has no per-request content (main.js loads everything), so it
+# is rendered once and reused
+_index_html = None
+
 @app.route('/')
 def index():
     """Main dashboard page."""
-    return render_template('dashboard.html')
+    global _index_html
+    if _index_html is None or app.debug:
+        _index_html = render_template('dashboard.html')
+    return _index_html, 200, {
+        'Content-Type': 'text/html; charset=utf-8',
+        'Cache-Control': 'public, max-age=60'
+    }
 
 @app.route('/api/usb/devices')
 def get_usb_devices():
@@ -70,9 +86,8 @@ def mount_usb_device(device):
     """Mount a USB device."""
     try:
         # Decode the device name in case it's URL-encoded
-        import urllib.parse
         original_device = device
-        device = urllib.parse.unquote(device)
+        device = unquote(device)
         
         # Ensure device has leading slash if it's a device path
         if device.startswith('dev/') and not device.startswith('/dev/'):
@@ -130,6 +145,33 @@ def get_usb_files():
 def upload_to_usb():
     """Upload file to USB drive."""
     try:
+        # Reject oversized uploads before any of the body is read
+        if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+            raise RequestEntityTooLarge()
+
+        # Raw uploads skip multipart parsing and Werkzeug's temporary spool
+        # file, so the body is written to the USB drive in a single pass
+        if request.mimetype == 'application/octet-stream':
+            filename = request.args.get('filename', '')
+            if not filename:
+                return jsonify({
+                    'success': False,
+                    'error': 'No file selected'
+                }), 400
+
+            if not file_ops.is_allowed_filename(filename):
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid file type'
+                }), 400
+
+            result = file_ops.upload_stream(request.stream, filename, request.content_length)
+            return jsonify({
+                'success': True,
+                'message': f'File {filename} uploaded successfully',
+                'file_info': result
+            })
+
         if 'file' not in request.files:
             return jsonify({
                 'success': False,
@@ -255,6 +297,15 @@ def rename_file(filename):
             'error': str(e)
         }), 500
 
+def _file_etag(file_path: str, stat: os.stat_result) -> str:
+    """ETag for a download, the same one send_file generates when given a path.
+    
+    Mirrors Werkzeug's formula (mtime, size, adler32 of the path) so ETags
+    held by clients stay valid; send_file can't compute it from a file object.
+    """
+    check = adler32(file_path.encode('utf-8')) & 0xFFFFFFFF
+    return f"{stat.st_mtime}-{stat.st_size}-{check}"
+
 @app.route('/api/usb/download/<path:filename>')
 def download_file(filename):
     """Download a file from USB drive."""
@@ -262,7 +313,27 @@ def download_file(filename):
         file_path = file_ops.get_file_path(filename)
         if not os.path.exists(file_path):
             abort(404)
-        return send_file(file_path, as_attachment=True)
+        
+        # Open the file ourselves so it gets a sequential readahead hint;
+        # send_file only knows size, mtime and etag when given a path
+        file = file_ops.open_file(filename)
+        try:
+            stat = os.fstat(file.fileno())
+            response = send_file(
+                file,
+                as_attachment=True,
+                download_name=os.path.basename(file_path),
+                last_modified=stat.st_mtime,
+                etag=_file_etag(file_path, stat),
+                conditional=False
+            )
+            response.content_length = stat.st_size
+            return response.make_conditional(request, accept_ranges=True, complete_length=stat.st_size)
+        except Exception:
+            # e.g. RequestedRangeNotSatisfiable from make_conditional; with
+            # conditional=False Werkzeug no longer closes the file for us
+            file.close()
+            raise
     except Exception as e:
         logger.error(f"Error downloading file {filename}: {e}")
         return jsonify({
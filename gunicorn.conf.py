@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for the Reverse USB File Management Platform.
+Run with: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 55005)}"
+
+# The mounted USB device is tracked in-process, so there must be exactly one
+# worker; threads give concurrent requests instead
+workers = 1
+worker_class = 'gthread'
+threads = 4
+
+# Downloads use Flask's send_file, which hands the open file to
+# wsgi.file_wrapper; with sendfile enabled gunicorn streams it with
+# os.sendfile() instead of a read/write loop in Python
+sendfile = True
+
+accesslog = '-'
@@ -495,12 +495,12 @@ class USBPlatform {
             const progress = ((i + 1) / files.length) * 100;
             
             try {
-                const formData = new FormData();
-                formData.append('file', file);
-                
-                const response = await fetch('/api/usb/upload', {
+                // Send the raw file body so the server can stream it straight
+                // to the USB drive instead of parsing multipart form data
+                const response = await fetch(`/api/usb/upload?filename=${encodeURIComponent(file.name)}`, {
                     method: 'POST',
-                    body: formData
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: file
                 });
                 
                 const data = await response.json();
@@ -5,19 +5,98 @@ Handles file operations on USB drives including listing, upload, download, delet
 """
 
 import os
+import queue
+import re
 import shutil
 import mimetypes
-import magic
 import logging
+import threading
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from werkzeug.utils import secure_filename
 from PIL import Image
 import io
 
 logger = logging.getLogger(__name__)
 
+# Chunk size used when copying uploads onto the USB drive. Larger chunks mean
+# far fewer read/write round-trips than shutil's 64KB default.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Uploads allowed to write to the USB drive at the same time. Requests are
+# served concurrently, but interleaving many large writes on one flash
+# device makes all of them slower.
+MAX_CONCURRENT_WRITES = 2
+
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Every 'rwx' permission triple as its octal string ('000'..'777'), so a
+# listing indexes a table instead of formatting oct(st_mode) per entry
+PERMISSION_STRINGS = tuple(f"{mode:03o}" for mode in range(0o1000))
+
+# Map extensions to icons
+ICON_MAP = {
+    # Images
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image',
+    '.bmp': 'image', '.tiff': 'image', '.webp': 'image',
+    
+    # Documents
+    '.pdf': 'pdf', '.doc': 'word', '.docx': 'word', '.txt': 'text',
+    '.rtf': 'text', '.odt': 'text',
+    
+    # Spreadsheets
+    '.xls': 'excel', '.xlsx': 'excel', '.csv': 'table', '.ods': 'table',
+    
+    # Presentations
+    '.ppt': 'powerpoint', '.pptx': 'powerpoint', '.odp': 'presentation',
+    
+    # Archives
+    '.zip': 'archive', '.rar': 'archive', '.7z': 'archive',
+    '.tar': 'archive', '.gz': 'archive',
+    
+    # Videos
+    '.mp4': 'video', '.avi': 'video', '.mkv': 'video', '.mov': 'video',
+    '.wmv': 'video', '.flv': 'video',
+    
+    # Audio
+    '.mp3': 'audio', '.wav': 'audio', '.flac': 'audio', '.aac': 'audio',
+    '.ogg': 'audio',
+    
+    # Code
+    '.py': 'code', '.js': 'code', '.html': 'code', '.css': 'code',
+    '.json': 'code', '.xml': 'code', '.sql': 'code'
+}
+
+# Names secure_filename would return unchanged: its safe character set,
+# without the leading/trailing '.' and '_' that it strips (so '..' never
+# matches)
+_SAFE_NAME_RE = re.compile(r'[A-Za-z0-9-](?:[A-Za-z0-9._-]{0,198}[A-Za-z0-9-])?\Z')
+
+
+def _secure_name(name: str) -> str:
+    """secure_filename, skipping its regex passes for already-safe names."""
+    return name if _SAFE_NAME_RE.match(name) else secure_filename(name)
+
+
+def _fadvise(fd: int, advice: int) -> None:
+    """Give the kernel a caching hint for the whole of fd; purely advisory."""
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError as e:
+        logger.debug(f"posix_fadvise failed: {e}")
+
+
+def _file_extension(filename: str) -> str:
+    """Return the lowercased extension of filename, e.g. '.jpg' or ''.
+    
+    Like os.path.splitext, a leading dot (hidden file) is not an extension.
+    Only the suffix is lowercased, not the whole name.
+    """
+    dot = filename.rfind('.')
+    return filename[dot:].lower() if dot > 0 else ''
+
 class FileOperations:
     """Handle file operations on USB drives."""
     
@@ -34,6 +113,11 @@ class FileOperations:
         }
         self.max_file_size = 100 * 1024 * 1024  # 100MB
         
+        self._write_slots = threading.BoundedSemaphore(MAX_CONCURRENT_WRITES)
+        # Copy buffers are reused across uploads; there is at most one per
+        # write slot, allocated the first time it is needed
+        self._copy_buffers = queue.SimpleQueue()
+        
     def _get_usb_manager(self):
         """Get USB manager instance, creating one if not provided."""
         if self.usb_manager is None:
@@ -41,12 +125,20 @@ class FileOperations:
             self.usb_manager = USBManager()
         return self.usb_manager
     
+    def _mount_point(self) -> Optional[str]:
+        """Get the USB mount point, or None if the device is no longer mounted.
+        
+        Checked on every call (a lookup in the USB manager's cached mountinfo
+        snapshot), so an unmount from outside the app is noticed before
+        anything is read from or written to the bare mount directory.
+        """
+        return self._get_usb_manager().get_mount_point()
+    
     def list_files(self, path: str = '') -> List[Dict]:
         """List files in the specified path on USB drive."""
         try:
             # Get mount point from USB manager
-            usb_manager = self._get_usb_manager()
-            mount_point = usb_manager.get_mount_point()
+            mount_point = self._mount_point()
             
             if not mount_point:
                 raise Exception("No USB device mounted")
@@ -56,39 +148,65 @@ class FileOperations:
             if not os.path.exists(full_path):
                 raise Exception(f"Path does not exist: {path}")
             
-            files = []
-            
-            for item in os.listdir(full_path):
-                item_path = os.path.join(full_path, item)
-                relative_path = os.path.join(path, item) if path else item
-                
-                try:
-                    stat = os.stat(item_path)
-                    is_dir = os.path.isdir(item_path)
-                    
-                    file_info = {
-                        'name': item,
-                        'path': relative_path,
-                        'is_directory': is_dir,
-                        'size': stat.st_size if not is_dir else 0,
-                        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                        'permissions': oct(stat.st_mode)[-3:],
-                        'type': self._get_file_type(item, is_dir),
-                        'icon': self._get_file_icon(item, is_dir),
-                        'human_size': self._format_size(stat.st_size) if not is_dir else '--'
-                    }
-                    
-                    files.append(file_info)
+            # (sort key, file info) pairs; the key is built once per entry
+            # while its name and type are at hand
+            entries = []
+            
+            # Bind the per-entry helpers once instead of resolving them on
+            # self (and datetime) for every entry in large directories
+            get_file_type = self._get_file_type
+            get_file_icon = self._get_file_icon
+            format_size = self._format_size
+            fromtimestamp = datetime.fromtimestamp
+            
+            # Entries' relative paths share this prefix; concatenating it is
+            # much cheaper than an os.path.join per entry
+            relative_prefix = f"{path.rstrip('/')}/" if path else ''
+            
+            # scandir hands back the type from the directory read itself, so
+            # each entry costs one cached stat instead of stat + isdir.
+            with os.scandir(full_path) as it:
+                for entry in it:
+                    item = entry.name
+                    relative_path = relative_prefix + item
                     
-                except OSError as e:
-                    logger.warning(f"Error accessing {item}: {e}")
-                    continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        
+                        if is_dir:
+                            # Folders have a fixed size, type and icon
+                            size, file_type, icon, human_size = 0, 'folder', 'folder', '--'
+                        else:
+                            size = stat.st_size
+                            file_type = get_file_type(item, False)
+                            icon = get_file_icon(item, False)
+                            human_size = format_size(size)
+                        
+                        file_info = {
+                            'name': item,
+                            'path': relative_path,
+                            'is_directory': is_dir,
+                            'size': size,
+                            # Serialized to ISO 8601 by the JSON provider
+                            'modified': fromtimestamp(stat.st_mtime),
+                            'created': fromtimestamp(stat.st_ctime),
+                            'permissions': PERMISSION_STRINGS[stat.st_mode & 0o777],
+                            'type': file_type,
+                            'icon': icon,
+                            'human_size': human_size
+                        }
+                        
+                        entries.append(((0 if is_dir else 1, item.casefold()), file_info))
+                        
+                    except OSError as e:
+                        logger.warning(f"Error accessing {item}: {e}")
+                        continue
             
             # Sort: directories first, then files alphabetically
-            files.sort(key=lambda x: (not x['is_directory'], x['name'].lower()))
+            entries.sort(key=itemgetter(0))
             
-            return files
+            return [file_info for _, file_info in entries]
             
         except Exception as e:
             logger.error(f"Error listing files in {path}: {e}")
@@ -98,14 +216,13 @@ class FileOperations:
         """Upload a file to USB drive."""
         try:
             # Get mount point
-            usb_manager = self._get_usb_manager()
-            mount_point = usb_manager.get_mount_point()
+            mount_point = self._mount_point()
             
             if not mount_point:
                 raise Exception("No USB device mounted")
             
             # Secure filename
-            filename = secure_filename(file.filename)
+            filename = _secure_name(file.filename)
             if not filename:
                 raise Exception("Invalid filename")
             
@@ -118,31 +235,54 @@ class FileOperations:
                 raise Exception("File too large (max 100MB)")
             
             # Save file to USB
-            file_path = os.path.join(mount_point, filename)
+            fd, filename, file_path = self._create_unique_file(mount_point, filename)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    self._copy_stream(file.stream, f)
+            except BaseException:
+                # Don't leave a truncated file holding the name
+                os.remove(file_path)
+                raise
             
-            # Check if file already exists
-            counter = 1
-            original_filename = filename
-            while os.path.exists(file_path):
-                name, ext = os.path.splitext(original_filename)
-                filename = f"{name}_{counter}{ext}"
-                file_path = os.path.join(mount_point, filename)
-                counter += 1
+            file_info = self._uploaded_file_info(filename, file_path)
             
-            with open(file_path, 'wb') as f:
-                shutil.copyfileobj(file, f)
+            logger.info(f"File uploaded successfully: {filename}")
+            return file_info
             
-            # Get file info
-            stat = os.stat(file_path)
-            file_info = {
-                'name': filename,
-                'path': filename,
-                'size': stat.st_size,
-                'human_size': self._format_size(stat.st_size),
-                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                'type': self._get_file_type(filename, False),
-                'icon': self._get_file_icon(filename, False)
-            }
+        except Exception as e:
+            logger.error(f"Error uploading file: {e}")
+            raise
+    
+    def upload_stream(self, stream, filename: str, content_length: Optional[int] = None) -> Dict:
+        """Upload a raw request body straight to USB drive, without spooling it first."""
+        try:
+            # Get mount point
+            mount_point = self._mount_point()
+            
+            if not mount_point:
+                raise Exception("No USB device mounted")
+            
+            # Secure filename
+            filename = _secure_name(filename)
+            if not filename:
+                raise Exception("Invalid filename")
+            
+            # Check file size up front; the stream itself is capped at
+            # MAX_CONTENT_LENGTH by Werkzeug
+            if content_length is not None and content_length > self.max_file_size:
+                raise Exception("File too large (max 100MB)")
+            
+            # Save file to USB
+            fd, filename, file_path = self._create_unique_file(mount_point, filename)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    self._copy_stream(stream, f)
+            except BaseException:
+                # Don't leave a truncated file behind if the client went away
+                os.remove(file_path)
+                raise
+            
+            file_info = self._uploaded_file_info(filename, file_path)
             
             logger.info(f"File uploaded successfully: {filename}")
             return file_info
@@ -151,12 +291,69 @@ class FileOperations:
             logger.error(f"Error uploading file: {e}")
             raise
     
+    def _create_unique_file(self, mount_point: str, filename: str) -> Tuple[int, str, str]:
+        """Create a new file that does not clash with an existing one.
+        
+        Returns (fd, filename, path). O_EXCL makes the existence check and the
+        create a single atomic step, so two uploads can't claim the same name.
+        """
+        name, ext = os.path.splitext(filename)
+        counter = 1
+        while True:
+            file_path = os.path.join(mount_point, filename)
+            try:
+                fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                return fd, filename, file_path
+            except FileExistsError:
+                filename = f"{name}_{counter}{ext}"
+                counter += 1
+    
+    def _uploaded_file_info(self, filename: str, file_path: str) -> Dict:
+        """Get file info for a freshly uploaded file."""
+        stat = os.stat(file_path)
+        return {
+            'name': filename,
+            'path': filename,
+            'size': stat.st_size,
+            'human_size': self._format_size(stat.st_size),
+            'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            'type': self._get_file_type(filename, False),
+            'icon': self._get_file_icon(filename, False)
+        }
+    
+    def _copy_stream(self, src, dst) -> None:
+        """Copy an upload stream into an open destination file."""
+        with self._write_slots:
+            try:
+                buf = self._copy_buffers.get_nowait()
+            except queue.Empty:
+                buf = bytearray(COPY_CHUNK_SIZE)
+            
+            try:
+                _fadvise(dst.fileno(), os.POSIX_FADV_SEQUENTIAL)
+                
+                readinto = getattr(src, 'readinto', None)
+                if readinto is None:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                else:
+                    # readinto fills the pooled buffer in place, so no bytes
+                    # object is allocated per chunk
+                    view = memoryview(buf)
+                    while n := readinto(buf):
+                        dst.write(view[:n])
+            finally:
+                self._copy_buffers.put(buf)
+            
+            # The upload won't be read back here, so start writeback and let
+            # the kernel drop its pages instead of filling the Pi's page cache
+            dst.flush()
+            _fadvise(dst.fileno(), os.POSIX_FADV_DONTNEED)
+    
     def delete_file(self, filename: str) -> bool:
         """Delete a file from USB drive."""
         try:
             # Get mount point
-            usb_manager = self._get_usb_manager()
-            mount_point = usb_manager.get_mount_point()
+            mount_point = self._mount_point()
             
             if not mount_point:
                 raise Exception("No USB device mounted")
@@ -182,8 +379,7 @@ class FileOperations:
         """Rename a file on USB drive."""
         try:
             # Get mount point
-            usb_manager = self._get_usb_manager()
-            mount_point = usb_manager.get_mount_point()
+            mount_point = self._mount_point()
             
             if not mount_point:
                 raise Exception("No USB device mounted")
@@ -222,14 +418,13 @@ class FileOperations:
         """Create a new folder on USB drive."""
         try:
             # Get mount point
-            usb_manager = self._get_usb_manager()
-            mount_point = usb_manager.get_mount_point()
+            mount_point = self._mount_point()
             
             if not mount_point:
                 raise Exception("No USB device mounted")
             
             # Secure folder name
-            folder_name = secure_filename(folder_name)
+            folder_name = _secure_name(folder_name)
             if not folder_name:
                 raise Exception("Invalid folder name")
             
@@ -265,54 +460,36 @@ class FileOperations:
     
     def get_file_path(self, filename: str) -> str:
         """Get the full path of a file on USB drive."""
-        usb_manager = self._get_usb_manager()
-        mount_point = usb_manager.get_mount_point()
+        mount_point = self._mount_point()
         
         if not mount_point:
             raise Exception("No USB device mounted")
         
         return os.path.join(mount_point, filename)
     
+    def open_file(self, filename: str):
+        """Open a file on USB drive for reading front to back (downloads)."""
+        f = open(self.get_file_path(filename), 'rb')
+        _fadvise(f.fileno(), os.POSIX_FADV_SEQUENTIAL)
+        return f
+    
+    def is_allowed_filename(self, filename: str) -> bool:
+        """Check if filename has an allowed extension."""
+        return bool(filename) and _file_extension(filename) in self.allowed_extensions
+    
     def is_valid_file(self, file) -> bool:
-        """Check if uploaded file is valid."""
-        try:
-            # Check file extension
-            filename = file.filename.lower()
-            if not filename:
-                return False
-            
-            # Get file extension
-            ext = os.path.splitext(filename)[1]
-            
-            # Check if extension is allowed
-            if ext not in self.allowed_extensions:
-                return False
-            
-            # Check file content type (basic check)
-            file.seek(0)
-            content = file.read(1024)  # Read first 1KB
-            file.seek(0)  # Reset position
-            
-            # Use python-magic to check file type
-            try:
-                file_type = magic.from_buffer(content, mime=True)
-                # Basic validation - could be enhanced
-                return True
-            except:
-                # Fallback to extension check
-                return ext in self.allowed_extensions
-                
-        except Exception as e:
-            logger.error(f"Error validating file: {e}")
-            return False
+        """Check if uploaded file is valid.
+        
+        Only the extension is checked, the same rule raw-body uploads get
+        through is_allowed_filename.
+        """
+        return self.is_allowed_filename(file.filename)
     
     def _get_file_type(self, filename: str, is_directory: bool) -> str:
         """Get file type based on extension."""
         if is_directory:
             return 'folder'
         
-        ext = os.path.splitext(filename.lower())[1]
-        
         # This part of the logic needs to be updated to use the allowed_extensions set
         # For now, it will return 'unknown' for any extension not in the set
         return 'unknown'
@@ -322,52 +499,13 @@ class FileOperations:
         if is_directory:
             return 'folder'
         
-        ext = os.path.splitext(filename.lower())[1]
-        
-        # Map extensions to icons
-        icon_map = {
-            # Images
-            '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image',
-            '.bmp': 'image', '.tiff': 'image', '.webp': 'image',
-            
-            # Documents
-            '.pdf': 'pdf', '.doc': 'word', '.docx': 'word', '.txt': 'text',
-            '.rtf': 'text', '.odt': 'text',
-            
-            # Spreadsheets
-            '.xls': 'excel', '.xlsx': 'excel', '.csv': 'table', '.ods': 'table',
-            
-            # Presentations
-            '.ppt': 'powerpoint', '.pptx': 'powerpoint', '.odp': 'presentation',
-            
-            # Archives
-            '.zip': 'archive', '.rar': 'archive', '.7z': 'archive',
-            '.tar': 'archive', '.gz': 'archive',
-            
-            # Videos
-            '.mp4': 'video', '.avi': 'video', '.mkv': 'video', '.mov': 'video',
-            '.wmv': 'video', '.flv': 'video',
-            
-            # Audio
-            '.mp3': 'audio', '.wav': 'audio', '.flac': 'audio', '.aac': 'audio',
-            '.ogg': 'audio',
-            
-            # Code
-            '.py': 'code', '.js': 'code', '.html': 'code', '.css': 'code',
-            '.json': 'code', '.xml': 'code', '.sql': 'code'
-        }
-        
-        return icon_map.get(ext, 'file')
+        return ICON_MAP.get(_file_extension(filename), 'file')
     
     def _format_size(self, size_bytes: int) -> str:
         """Format file size in human readable format."""
         if size_bytes == 0:
             return "0 B"
         
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
-        
-        return f"{size_bytes:.1f} {size_names[i]}" 
\ No newline at end of file
+        # Each unit is 2**10 of the previous one, so the bit length picks it
+        i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+        return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_UNITS[i]}"
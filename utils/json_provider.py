@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+orjson JSON Provider
+Serializes API responses with orjson instead of the standard library json module.
+"""
+
+from typing import Any
+
+import orjson
+from flask.json.provider import JSONProvider
+
+# Coerce int/float/bool/None dict keys to strings the way the stdlib json
+# module does, instead of orjson's default TypeError
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Installed as ``app.json`` so every ``jsonify`` call and ``request.get_json``
+    goes through orjson. Naive datetimes are emitted as ISO 8601 strings, the
+    same format ``datetime.isoformat()`` produces.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as a JSON string."""
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserialize JSON text or UTF-8 bytes."""
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Build an application/json response without a bytes -> str round-trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS),
+            mimetype='application/json'
+        )
+
+
+def _default(o: Any) -> Any:
+    """Fallback for types orjson does not handle natively."""
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
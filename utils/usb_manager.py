@@ -5,17 +5,114 @@ Handles USB device detection, mounting, unmounting, and status monitoring.
 """
 
 import os
-import json
-import shutil
+import re
+import stat
+import ctypes
+import ctypes.util
+import errno
 import subprocess
 import logging
-import psutil
-from pathlib import Path
+import threading
+import time
 from typing import Dict, List, Optional, Tuple
 import pyudev
 
 logger = logging.getLogger(__name__)
 
+# Where udevd keeps device properties such as ID_BUS; without it (no udevd,
+# or a container without /run/udev mounted) udev can't tell us what is USB
+UDEV_DATA_DIR = '/run/udev/data'
+
+SIZE_UNITS = "BKMGTPE"
+
+# Partition number at the end of a partition's kernel name: sda1 -> sda, and
+# nvme0n1p1 / mmcblk0p1 -> nvme0n1 / mmcblk0 where a 'p' follows a digit
+_PARTITION_SUFFIX_RE = re.compile(r'(?<=\d)p\d+$|\d+$')
+
+# How long (seconds) enumeration and status results are reused; the UI polls
+# both far more often than devices come and go
+DEVICE_CACHE_TTL = 1.0
+STATUS_CACHE_TTL = 0.5
+
+# Filesystems tried, in order, when mounting with mount(2) directly. USB
+# drives are nearly always FAT, exFAT, NTFS or ext4; anything else falls
+# through to the mount helper, which probes the filesystem itself. 'ntfs'
+# is left out on purpose: that kernel driver (or ntfs3's alias for it) is
+# read-only, where the helper would use the read-write ntfs-3g.
+MOUNT_FSTYPES = ('vfat', 'exfat', 'ntfs3', 'ext4')
+
+# How long (seconds) a /proc/self/mountinfo snapshot is trusted
+MOUNTS_CACHE_TTL = 0.25
+
+# mountinfo escapes space, tab, newline and backslash as \ooo octal
+_MOUNTINFO_ESCAPE_RE = re.compile(r'\\([0-7]{3})')
+
+# One KEY="value" pair of lsblk -P output
+_LSBLK_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# lsblk -P writes bytes it considers unsafe (non-ASCII, '"', '$', '`', '\')
+# as \xNN escapes
+_LSBLK_ESCAPE_RE = re.compile(rb'\\x([0-9a-fA-F]{2})')
+
+
+def _read_mounts() -> Dict[str, str]:
+    """Map every mount point to its source device, from /proc/self/mountinfo."""
+    mounts = {}
+    with open('/proc/self/mountinfo') as f:
+        for line in f:
+            # "id parent major:minor root MOUNT_POINT options... - fstype SOURCE superopts"
+            fields = line.split()
+            try:
+                source = fields[fields.index('-', 6) + 2]
+            except (ValueError, IndexError):
+                continue
+            mount_point = _MOUNTINFO_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), fields[4])
+            mounts[mount_point] = source
+    return mounts
+
+
+def _lsblk_value(value: str) -> str:
+    """Undo lsblk -P's \\xNN escaping, e.g. '\\xc3\\x9cSB' -> 'ÜSB'."""
+    if '\\x' not in value:
+        return value
+    raw = _LSBLK_ESCAPE_RE.sub(lambda m: bytes((int(m.group(1), 16),)), value.encode())
+    return raw.decode('utf-8', 'replace')
+
+
+def _human_size(size_bytes: int) -> str:
+    """Format a byte count the way lsblk does, e.g. '14.9G' or '512M'."""
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_UNITS) - 1) if size_bytes else 0
+    size = f"{size_bytes / (1 << (i * 10)):.1f}".removesuffix('.0')
+    return f"{size}{SIZE_UNITS[i]}"
+
+
+def _read_block_sizes() -> Dict[str, int]:
+    """Get the size in bytes of every block device, keyed by kernel name.
+    
+    /proc/partitions lists all of them in a single read, instead of one
+    sysfs open/read/close per device.
+    """
+    sizes = {}
+    try:
+        with open('/proc/partitions') as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        logger.warning("Could not read /proc/partitions: %s", e)
+        return sizes
+    
+    # "major minor #blocks name", sizes in 1KiB blocks, after a header line
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 4 and fields[2].isdigit():
+            sizes[fields[3]] = int(fields[2]) * 1024
+    return sizes
+
+
+def _size_label(sizes: Dict[str, int], name: str) -> str:
+    """Get the human readable size of block device name from _read_block_sizes()."""
+    size = sizes.get(name)
+    return _human_size(size) if size is not None else 'Unknown'
+
 class USBManager:
     """Manages USB device operations."""
     
@@ -24,30 +121,192 @@ class USBManager:
         self.mounted_device = None
         self.mount_base = "/media/usb"
         
+        # Every device is mounted at this one fixed directory
+        self.mount_point_path = os.path.join(self.mount_base, "current")
+        
         # Ensure mount directory exists
-        os.makedirs(self.mount_base, exist_ok=True)
+        os.makedirs(self.mount_point_path, exist_ok=True)
+        
+        # libc for calling mount(2)/umount2(2) without forking sudo mount
+        self._libc = None
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            self._libc.mount.argtypes = (
+                ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_void_p
+            )
+            self._libc.umount2.argtypes = (ctypes.c_char_p, ctypes.c_int)
+        except (OSError, AttributeError) as e:
+            self._libc = None
+            logger.warning("libc mount unavailable, using the mount command: %s", e)
+        
+        # (timestamp, result) of the last enumeration / status read
+        self._dev_cache = (0.0, [])
+        self._status_cache = (0.0, {})
+        self._mounts_cache = (0.0, {})
+        # Bumped by _invalidate_caches; a read that started before an
+        # invalidation must not store its (now outdated) result
+        self._cache_generation = 0
+        # Disk name -> sysfs removable flag, which is fixed for a device.
+        # Only kept while the udev monitor runs: its 'remove' events are the
+        # only reliable sign that a name may now belong to a different disk
+        self._removable_cache: Dict[str, bool] = {}
+        
+        # udev context used for device enumeration
+        self._udev = None
+        if os.path.isdir(UDEV_DATA_DIR):
+            try:
+                self._udev = pyudev.Context()
+            except Exception as e:
+                logger.warning("udev unavailable, falling back to lsblk: %s", e)
+        
+        # Serialize enumerations / status reads that replace the cached result
+        self._dev_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+        # Set whenever udev reports a block device change; waiters clear it
+        self.devices_changed = threading.Event()
+        
+        # With a udev monitor the device list is refreshed on add/remove/change
+        # events and stays valid in between; without one it expires by TTL
+        self._observer = None
+        if self._udev is not None:
+            try:
+                monitor = pyudev.Monitor.from_netlink(self._udev)
+                monitor.filter_by('block')
+                self._observer = pyudev.MonitorObserver(
+                    monitor, callback=self._on_udev_event, name='usb-device-monitor'
+                )
+                self._observer.start()
+            except Exception as e:
+                self._observer = None
+                logger.warning("udev monitor unavailable, polling for devices: %s", e)
     
-    def get_available_devices(self) -> List[Dict]:
+    def close(self) -> None:
+        """Stop the udev monitor thread and release the udev context."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        self._removable_cache.clear()
+        self._udev = None
+    
+    def get_available_devices(self, force_refresh: bool = False) -> List[Dict]:
         """Get list of available USB storage devices."""
+        cached_at, devices = self._dev_cache
+        if self._observer is not None:
+            stale = cached_at == 0.0
+        else:
+            stale = time.monotonic() - cached_at >= DEVICE_CACHE_TTL
+        
+        if force_refresh or stale:
+            # Only wait on an enumeration already in flight when there is no
+            # previous snapshot to fall back on
+            devices = self._refresh_devices(wait=force_refresh or cached_at == 0.0)
+        
+        # Mounting and unmounting rarely produce a uevent, so mount points
+        # are looked up on every read instead of being cached with the list
+        mountpoints = {}
+        in_use = set()
+        for mount_point, source in self._mounts().items():
+            if self._in_mount_base(mount_point):
+                mountpoints[source] = mount_point
+            else:
+                in_use.add(source)
+        
+        # Devices mounted anywhere else (e.g. the root filesystem of a Pi
+        # booted from a USB SSD) are not offered. Hand out copies so callers
+        # can't modify the cached entries.
+        return [
+            dict(device, mountpoint=mountpoints.get(device['name']))
+            for device in devices if device['name'] not in in_use
+        ]
+    
+    def _refresh_devices(self, wait: bool = True) -> List[Dict]:
+        """Enumerate devices and replace the cached snapshot.
+        
+        With wait=False, a caller that finds another enumeration already
+        running (e.g. lsblk stalled on a hung device) gets the current
+        snapshot instead of blocking until it finishes.
+        """
+        if not self._dev_lock.acquire(blocking=wait):
+            return self._dev_cache[1]
+        try:
+            generation = self._cache_generation
+            devices = self._enumerate_devices()
+            if generation == self._cache_generation:
+                self._dev_cache = (time.monotonic(), devices)
+        finally:
+            self._dev_lock.release()
+        return devices
+    
+    def _on_udev_event(self, device) -> None:
+        """Refresh the device snapshot when a block device is added, removed or changed."""
+        if device.action == 'remove':
+            # The kernel name may be reused by a different disk later
+            self._removable_cache.pop(device.sys_name, None)
+        
+        try:
+            self._refresh_devices()
+        except Exception as e:
+            # An exception here would stop the observer thread for good
+            logger.error("Error refreshing USB devices after udev event: %s", e)
+        self.devices_changed.set()
+    
+    def _enumerate_devices(self) -> List[Dict]:
+        """Enumerate USB storage devices, preferring udev over lsblk."""
+        if self._udev is not None:
+            try:
+                return self._get_devices_udev()
+            except Exception as e:
+                logger.error("Error getting USB devices from udev: %s", e)
+        
+        return self._get_devices_lsblk()
+    
+    def _get_devices_udev(self) -> List[Dict]:
+        """Get partitions of removable USB disks straight from the udev database, without lsblk."""
+        sizes = _read_block_sizes()
+        
+        devices = []
+        for device in self._udev.list_devices(subsystem='block', ID_BUS='usb'):
+            if device.get('DEVTYPE') != 'partition':
+                continue
+            
+            # Same rule as the lsblk path: only disks sysfs marks removable
+            disk = device.find_parent('block', 'disk')
+            if disk is None or not self._is_removable_disk({'name': disk.sys_name}):
+                continue
+            
+            devname = device.get('DEVNAME') or f"/dev/{device.sys_name}"
+            devices.append({
+                'name': devname,
+                'size': _size_label(sizes, device.sys_name),
+                'label': device.get('ID_FS_LABEL'),
+                'mountpoint': None,
+                'type': 'part',
+                'fstype': device.get('ID_FS_TYPE')
+            })
+        
+        return devices
+    
+    def _get_devices_lsblk(self) -> List[Dict]:
+        """Get list of available USB storage devices using lsblk."""
         devices = []
         
         try:
-            # Use lsblk to get block devices with more details
+            # Use lsblk to get block devices with more details; -P prints
+            # every device (children included) as one line of KEY="value"
+            # pairs and -b gives sizes in bytes
             result = subprocess.run(
-                ['lsblk', '-J', '-o', 'NAME,SIZE,TYPE,MOUNTPOINT,LABEL,FSTYPE'],
+                ['lsblk', '-P', '-b', '-o', 'NAME,SIZE,TYPE,MOUNTPOINT,LABEL,FSTYPE'],
                 capture_output=True, text=True, timeout=10
             )
             
             if result.returncode == 0:
-                data = json.loads(result.stdout)
-                
-                # Process all devices (including nested children)
                 all_devices = []
-                for device in data.get('blockdevices', []):
-                    all_devices.append(device)
-                    # Add children devices
-                    if 'children' in device:
-                        all_devices.extend(device['children'])
+                for line in result.stdout.splitlines():
+                    # Empty fields become None, as null fields did in lsblk -J
+                    all_devices.append({
+                        key.lower(): _lsblk_value(value) or None
+                        for key, value in _LSBLK_RE.findall(line)
+                    })
                 
                 # First, find USB disks
                 usb_disks = set()
@@ -58,9 +317,10 @@ class USBManager:
                 # Then find partitions of USB disks
                 for device in all_devices:
                     if device.get('type') == 'part' and self._is_usb_partition(device, usb_disks):
+                        size = device.get('size')
                         device_info = {
                             'name': f"/dev/{device['name']}",  # Add /dev/ prefix
-                            'size': device.get('size', 'Unknown'),
+                            'size': _human_size(int(size)) if size else 'Unknown',
                             'label': device.get('label', 'No Label'),
                             'mountpoint': device.get('mountpoint', ''),
                             'type': device.get('type', ''),
@@ -69,7 +329,7 @@ class USBManager:
                         devices.append(device_info)
             
         except Exception as e:
-            logger.error(f"Error getting USB devices: {e}")
+            logger.error("Error getting USB devices: %s", e)
             # Fallback method using /proc/partitions
             devices = self._get_devices_fallback()
         
@@ -77,40 +337,35 @@ class USBManager:
     
     def _is_removable_disk(self, device: Dict) -> bool:
         """Check if device is a removable disk."""
+        name = device.get('name')
+        if not name:
+            return False
+        
+        device_name = name.rpartition('/')[2]
+        cached = self._removable_cache.get(device_name)
+        if cached is not None:
+            return cached
+        
         try:
-            device_name = device['name'].replace('/dev/', '')
-            device_path = f"/sys/block/{device_name}"
-            if os.path.exists(device_path):
-                removable_path = os.path.join(device_path, 'removable')
-                if os.path.exists(removable_path):
-                    with open(removable_path, 'r') as f:
-                        return f.read().strip() == '1'
-        except:
-            pass
-        return False
+            with open(f"/sys/block/{device_name}/removable") as f:
+                removable = f.read(1) == '1'
+        except OSError:
+            # No sysfs entry (not a whole disk, or removed mid-enumeration)
+            return False
+        
+        if self._observer is not None:
+            self._removable_cache[device_name] = removable
+        return removable
     
     def _is_usb_partition(self, device: Dict, usb_disks: set) -> bool:
         """Check if partition belongs to a USB disk."""
-        try:
-            device_name = device['name']
-            # Extract disk name from partition name (e.g., sda1 -> sda)
-            if '/' in device_name:
-                disk_name = device_name.split('/')[-1]
-            else:
-                disk_name = device_name
-            
-            # Remove partition number to get disk name
-            for i in range(len(disk_name)):
-                if disk_name[i].isdigit():
-                    disk_name = disk_name[:i]
-                    break
-            
-            # Check if this partition belongs to a USB disk
-            # usb_disks contains names like 'sda', not '/dev/sda'
-            return disk_name in usb_disks
-        except:
-            pass
-        return False
+        name = device.get('name')
+        if not name:
+            return False
+        
+        # Extract disk name from partition name (e.g., sda1 -> sda)
+        # usb_disks contains names like 'sda', not '/dev/sda'
+        return _PARTITION_SUFFIX_RE.sub('', name.rpartition('/')[2]) in usb_disks
     
     def _is_usb_storage(self, device: Dict) -> bool:
         """Legacy method - kept for compatibility."""
@@ -121,111 +376,204 @@ class USBManager:
         devices = []
         
         try:
-            # Check common USB device patterns
-            usb_patterns = ['/dev/sd*', '/dev/usb*']
+            sizes = _read_block_sizes()
             
-            for pattern in usb_patterns:
-                for device_path in Path('/dev').glob(pattern.replace('/dev/', '')):
-                    if device_path.is_block_device():
-                        # Get device size
-                        try:
-                            size = subprocess.run(
-                                ['lsblk', '-n', '-o', 'SIZE', str(device_path)],
-                                capture_output=True, text=True, timeout=5
-                            ).stdout.strip()
-                        except:
-                            size = 'Unknown'
-                        
-                        devices.append({
-                            'name': str(device_path),
-                            'size': size,
-                            'label': 'USB Device',
-                            'mountpoint': '',
-                            'type': 'disk'
-                        })
+            # Check common USB device names (sd*, usb*) in one pass over /dev
+            with os.scandir('/dev') as entries:
+                for entry in entries:
+                    if not entry.name.startswith(('sd', 'usb')):
+                        continue
+                    try:
+                        if not stat.S_ISBLK(entry.stat().st_mode):
+                            continue
+                    except OSError:
+                        continue
+                    
+                    devices.append({
+                        'name': entry.path,
+                        'size': _size_label(sizes, entry.name),
+                        'label': 'USB Device',
+                        'mountpoint': '',
+                        'type': 'disk'
+                    })
         except Exception as e:
-            logger.error(f"Error in fallback device detection: {e}")
+            logger.error("Error in fallback device detection: %s", e)
         
         return devices
     
     def mount_device(self, device_name: str) -> str:
         """Mount a USB device."""
         try:
-            # Check if device exists
-            if not os.path.exists(device_name):
+            # Check the device exists and is a block device, in one stat
+            try:
+                st = os.stat(device_name)
+            except FileNotFoundError:
                 raise Exception(f"Device {device_name} does not exist")
+            if not stat.S_ISBLK(st.st_mode):
+                raise Exception(f"{device_name} is not a block device")
+            
+            # Never take over a device the system is using elsewhere
+            in_use = [
+                mount_point for mount_point, source in self._mounts(force_refresh=True).items()
+                if source == device_name and not self._in_mount_base(mount_point)
+            ]
+            if in_use:
+                raise Exception(f"Device {device_name} is already mounted at {in_use[0]}")
             
             # Unmount any previously mounted device
             if self.mount_point:
                 self.unmount_device()
             
-            # Create unique mount point
-            mount_point = os.path.join(self.mount_base, f"usb_{os.getpid()}")
-            os.makedirs(mount_point, exist_ok=True)
+            mount_point = self.mount_point_path
             
-            # Try to mount the device
-            result = subprocess.run(
-                ['sudo', 'mount', device_name, mount_point],
-                capture_output=True, text=True, timeout=30
-            )
+            # Clear out anything still mounted there, e.g. left behind by a
+            # previous run that did not unmount
+            if mount_point in self._mounts(force_refresh=True):
+                logger.warning("Unmounting stale mount at %s", mount_point)
+                self._umount(mount_point)
             
-            if result.returncode != 0:
-                # Try mounting with auto filesystem detection
+            # Try to mount the device directly, then through the mount helper
+            if not self._mount_direct(device_name, mount_point):
                 result = subprocess.run(
-                    ['sudo', 'mount', '-t', 'auto', device_name, mount_point],
+                    ['sudo', 'mount', device_name, mount_point],
                     capture_output=True, text=True, timeout=30
                 )
                 
                 if result.returncode != 0:
-                    raise Exception(f"Failed to mount device: {result.stderr}")
+                    # Try mounting with auto filesystem detection
+                    result = subprocess.run(
+                        ['sudo', 'mount', '-t', 'auto', device_name, mount_point],
+                        capture_output=True, text=True, timeout=30
+                    )
+                    
+                    if result.returncode != 0:
+                        raise Exception(f"Failed to mount device: {result.stderr}")
             
             # Verify mount was successful
-            if not os.path.ismount(mount_point):
+            if mount_point not in self._mounts(force_refresh=True):
                 raise Exception("Mount verification failed")
             
             self.mount_point = mount_point
             self.mounted_device = device_name
+            self._invalidate_caches()
             
-            logger.info(f"Successfully mounted {device_name} at {mount_point}")
+            logger.info("Successfully mounted %s at %s", device_name, mount_point)
             return mount_point
             
         except Exception as e:
-            logger.error(f"Error mounting device {device_name}: {e}")
+            logger.error("Error mounting device %s: %s", device_name, e)
             raise
     
+    def _mount_direct(self, device_name: str, mount_point: str) -> bool:
+        """Mount with the mount(2) syscall, as the type udev detected or each of MOUNT_FSTYPES.
+        
+        Returns False when the mount helper should be used instead: libc is
+        unavailable, the process lacks CAP_SYS_ADMIN, udev detected a type
+        outside MOUNT_FSTYPES, or no type matched.
+        """
+        if self._libc is None:
+            return False
+        
+        # Probing blindly only when udev can't say, which also keeps failed
+        # superblock probes out of the kernel log
+        fstypes = MOUNT_FSTYPES
+        detected = self._detected_fstype(device_name)
+        if detected is not None:
+            if detected not in MOUNT_FSTYPES:
+                return False
+            fstypes = (detected,)
+        
+        source, target = device_name.encode(), mount_point.encode()
+        for fstype in fstypes:
+            if self._libc.mount(source, target, fstype.encode(), 0, None) == 0:
+                return True
+            
+            err = ctypes.get_errno()
+            if err == errno.EPERM:
+                # Not privileged; only sudo mount can help
+                return False
+            # EINVAL/ENODEV: not this filesystem, or not in this kernel
+            logger.debug("mount %s as %s failed: %s", device_name, fstype, os.strerror(err))
+        
+        return False
+    
+    def _detected_fstype(self, device_name: str) -> Optional[str]:
+        """Get the filesystem type udev detected on device_name (ID_FS_TYPE), if known."""
+        if self._udev is None:
+            return None
+        
+        try:
+            device = pyudev.Devices.from_device_file(self._udev, device_name)
+        except (pyudev.DeviceNotFoundError, ValueError, OSError) as e:
+            logger.debug("No udev entry for %s: %s", device_name, e)
+            return None
+        return device.get('ID_FS_TYPE') or None
+    
+    def _umount_direct(self, mount_point: str) -> bool:
+        """Unmount with the umount2(2) syscall; False if the helper should retry."""
+        if self._libc is None:
+            return False
+        
+        if self._libc.umount2(mount_point.encode(), 0) == 0:
+            return True
+        
+        logger.debug("umount %s failed: %s", mount_point, os.strerror(ctypes.get_errno()))
+        return False
+    
+    def _umount(self, mount_point: str) -> None:
+        """Unmount mount_point directly, then through the umount helper."""
+        if self._umount_direct(mount_point):
+            return
+        
+        result = subprocess.run(
+            ['sudo', 'umount', mount_point],
+            capture_output=True, text=True, timeout=30
+        )
+        
+        if result.returncode != 0:
+            logger.warning("Unmount warning: %s", result.stderr)
+    
     def unmount_device(self) -> bool:
         """Unmount the currently mounted USB device."""
         if not self.mount_point:
             return True
         
         try:
-            # Unmount the device
-            result = subprocess.run(
-                ['sudo', 'umount', self.mount_point],
-                capture_output=True, text=True, timeout=30
-            )
-            
-            if result.returncode != 0:
-                logger.warning(f"Unmount warning: {result.stderr}")
-            
-            # Remove mount point directory
-            try:
-                os.rmdir(self.mount_point)
-            except OSError:
-                pass  # Directory might not be empty or already removed
+            # Unmount the device; the mount point directory is kept for reuse
+            self._umount(self.mount_point)
             
             self.mount_point = None
             self.mounted_device = None
+            self._invalidate_caches()
             
             logger.info("USB device unmounted successfully")
             return True
             
         except Exception as e:
-            logger.error(f"Error unmounting device: {e}")
+            logger.error("Error unmounting device: %s", e)
             raise
     
-    def get_status(self) -> Dict:
+    def get_status(self, force_refresh: bool = False) -> Dict:
         """Get USB drive status and space information."""
+        now = time.monotonic()
+        cached_at, status = self._status_cache
+        if force_refresh or now - cached_at >= STATUS_CACHE_TTL:
+            # statvfs on a stalled device can hang; while one read is in
+            # flight, other callers get the last status instead of queueing
+            wait = force_refresh or cached_at == 0.0
+            if self._status_lock.acquire(blocking=wait):
+                try:
+                    generation = self._cache_generation
+                    status = self._read_status()
+                    if generation == self._cache_generation:
+                        self._status_cache = (time.monotonic(), status)
+                finally:
+                    self._status_lock.release()
+        
+        return dict(status)
+    
+    def _read_status(self) -> Dict:
+        """Read USB drive status and space information."""
         status = {
             'mounted': False,
             'device': None,
@@ -236,31 +584,58 @@ class USBManager:
             'usage_percent': 0
         }
         
-        if not self.mount_point or not os.path.ismount(self.mount_point):
+        if not self.mount_point or self.mount_point not in self._mounts():
             return status
         
         try:
-            # Get disk usage
-            usage = shutil.disk_usage(self.mount_point)
+            # Get disk usage (the same figures shutil.disk_usage reports)
+            st = os.statvfs(self.mount_point)
+            total = st.f_frsize * st.f_blocks
+            used = st.f_frsize * (st.f_blocks - st.f_bfree)
+            free = st.f_frsize * st.f_bavail
             
             status.update({
                 'mounted': True,
                 'device': self.mounted_device,
                 'mount_point': self.mount_point,
-                'total_space': usage.total,
-                'used_space': usage.used,
-                'free_space': usage.free,
-                'usage_percent': round((usage.used / usage.total) * 100, 1)
+                'total_space': total,
+                'used_space': used,
+                'free_space': free,
+                'usage_percent': round((used / total) * 100, 1) if total else 0
             })
             
         except Exception as e:
-            logger.error(f"Error getting USB status: {e}")
+            logger.error("Error getting USB status: %s", e)
         
         return status
     
+    def _invalidate_caches(self) -> None:
+        """Force the next device list and status read to probe again."""
+        self._cache_generation += 1
+        self._dev_cache = (0.0, [])
+        self._status_cache = (0.0, {})
+        self._mounts_cache = (0.0, {})
+    
+    def _mounts(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Get {mount point: source} for the system, re-read at most every MOUNTS_CACHE_TTL.
+        
+        Replaces os.path.ismount, which stats the directory and its parent
+        on every call.
+        """
+        now = time.monotonic()
+        cached_at, mounts = self._mounts_cache
+        if force_refresh or now - cached_at >= MOUNTS_CACHE_TTL:
+            mounts = _read_mounts()
+            self._mounts_cache = (now, mounts)
+        return mounts
+    
+    def _in_mount_base(self, mount_point: str) -> bool:
+        """Check if mount_point is one this manager owns, under mount_base."""
+        return mount_point == self.mount_base or mount_point.startswith(self.mount_base + '/')
+    
     def is_device_mounted(self) -> bool:
         """Check if a USB device is currently mounted."""
-        return self.mount_point is not None and os.path.ismount(self.mount_point)
+        return self.mount_point is not None and self.mount_point in self._mounts()
     
     def get_mount_point(self) -> Optional[str]:
         """Get the current mount point."""